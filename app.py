@@ -2,20 +2,30 @@ import streamlit as st
 import os
 from dotenv import load_dotenv
 import reflection_logic
+import audio_memory
+import streaming_transcription
+import streaming_recorder
+import model_routing
 
 # Load environment variables
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError, InternalServerError, RateLimitError
 import speech_recognition as sr
 from streamlit_mic_recorder import mic_recorder
 import io
+import base64
 import time
 import random
+import uuid
 
 # Load environment variables
 load_dotenv()
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+# Routed calls run with SDK retries off; the router retries these once instead
+# (APITimeoutError is a subclass of APIConnectionError)
+TRANSIENT_API_ERRORS = (APIConnectionError, RateLimitError, InternalServerError)
+
 # Page config (Must be first Streamlit command)
 st.set_page_config(
     page_title="Ura Warriors - Reflection Session",
@@ -28,21 +38,68 @@ st.set_page_config(
 
 def transcribe_audio(audio_bytes):
     """Convert audio bytes to text using OpenAI Whisper (handles webm/wav/etc)."""
+    # Count the upload while it is in flight (never spilled: Whisper needs the bytes anyway)
+    upload = audio_memory.accountant.register(st.session_state.audio_session_id, audio_bytes, kind="upload", spill=False)
     try:
-        audio_file = io.BytesIO(audio_bytes)
-        audio_file.name = "input.webm"
-        
         transcript = client.audio.transcriptions.create(
             model="whisper-1",
-            file=audio_file
+            file=("input.webm", audio_bytes)
         )
         return transcript.text
     except Exception as e:
         st.error(f"Error processing audio: {e}")
         return None
+    finally:
+        audio_memory.accountant.release(upload)
+
+def transcribe_segment(audio_bytes, mime_type):
+    """Transcribe one live-recording segment. May run off the script thread, so errors are raised, not shown."""
+    extension = "mp4" if "mp4" in mime_type else "webm"
+    transcript = client.audio.transcriptions.create(
+        model="whisper-1",
+        file=(f"segment.{extension}", audio_bytes)
+    )
+    return transcript.text
+
+def collect_live_segments(recording):
+    """
+    Feed newly arrived live-recording segments to the background transcriber.
+
+    Returns:
+        tuple: (ready, text) - ready is True once the recording has stopped and
+        every segment is in; text is the joined transcript (may be None).
+    """
+    if not recording or recording["recording_id"] in st.session_state.processed_audio_ids:
+        return False, None
+
+    live = st.session_state.live_transcription
+    if live is None or live.recording_id != recording["recording_id"]:
+        live = streaming_transcription.StreamingTranscription(
+            recording["recording_id"],
+            transcribe_segment,
+            st.session_state.audio_session_id,
+            mime_type=recording.get("mime_type") or "audio/webm"
+        )
+        st.session_state.live_transcription = live
+
+    for segment in recording["segments"]:
+        live.submit(segment["seq"], base64.b64decode(segment["audio_base64"]))
+    st.session_state.live_ack = {"recording_id": live.recording_id, "seq": live.acked_seq}
+
+    final_seq = recording["final_seq"]
+    if final_seq is None or live.acked_seq < final_seq:
+        return False, None
 
-def generate_ai_response_audio(text, voice_selection):
-    """Generate audio from text using OpenAI TTS."""
+    # Finish first: if this run is interrupted, the next one can finish again
+    text = live.finish(final_seq)
+    st.session_state.processed_audio_ids.append(live.recording_id)
+    st.session_state.live_transcription = None
+    for error in live.errors:
+        st.error(f"Error processing audio: {error}")
+    return True, text
+
+def generate_ai_response_audio(text, voice_selection, stage="question"):
+    """Generate audio from text using OpenAI TTS. Returns a tracked AudioClip."""
     voice_map = {
         "Calm Female": "nova",
         "Calm Male": "onyx",
@@ -51,17 +108,27 @@ def generate_ai_response_audio(text, voice_selection):
     }
     voice_id = voice_map.get(voice_selection, "alloy")
     
-    try:
-        response = client.audio.speech.create(
-            model="tts-1",
+    def speak(route):
+        return client.with_options(timeout=route["budget_s"], max_retries=0).audio.speech.create(
+            model=route["model"],
             voice=voice_id,
             input=text
         )
-        return io.BytesIO(response.content)
+
+    try:
+        response = model_routing.router.call(stage, "tts", speak, retry_on=TRANSIENT_API_ERRORS)
+        return audio_memory.accountant.register(st.session_state.audio_session_id, response.content)
     except Exception as e:
         st.error(f"Error generating audio: {e}")
         return None
 
+def play_audio_clip(clip):
+    """Autoplay a tracked clip. Spilled clips stream from disk instead of the media file manager."""
+    if clip.spilled:
+        st.markdown(f"<audio src='{clip.url}' autoplay controls></audio>", unsafe_allow_html=True)
+    else:
+        st.audio(clip.take(), format="audio/mp3", autoplay=True)
+
 def process_interaction(user_text):
     """Main logic: Summary -> Logic -> Response -> Cleanup."""
     
@@ -98,12 +165,18 @@ def process_interaction(user_text):
 
     context_messages.append({"role": "user", "content": prompt})
 
-    try:
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini",
+    # Pick model and token cap for this stage of the session (also used for its TTS)
+    stage = model_routing.stage_for(st.session_state.current_state, next_step['should_close'])
+
+    def complete(route):
+        return client.with_options(timeout=route["budget_s"], max_retries=0).chat.completions.create(
+            model=route["model"],
             messages=context_messages,
-            max_tokens=150
+            max_tokens=route["max_tokens"]
         )
+
+    try:
+        completion = model_routing.router.call(stage, "chat", complete, retry_on=TRANSIENT_API_ERRORS)
         ai_text = completion.choices[0].message.content
     except Exception as e:
         ai_text = "I'm having trouble connecting. Let's pause."
@@ -113,7 +186,7 @@ def process_interaction(user_text):
     
     if next_step['should_close']:
         st.session_state.current_state = "Close"
-        return ai_text, True  # Return tuple with closing flag
+        return ai_text, True, stage  # Return tuple with closing flag and routing stage
     else:
         st.session_state.question_count += 1
         if st.session_state.current_state == "Intro":
@@ -121,7 +194,7 @@ def process_interaction(user_text):
         else:
              st.session_state.current_state = f"Q{st.session_state.question_count + 1}"
 
-    return ai_text, False  # Not closing
+    return ai_text, False, stage  # Not closing
 
 
 # POLISHED CSS - Clean and bug-free
@@ -332,7 +405,11 @@ def initialize_session_state():
         "messages": [],
         "current_voice": "Calm Female",
         "session_active": False,
-        "processed_audio_ids": []
+        "processed_audio_ids": [],
+        "audio_session_id": uuid.uuid4().hex,
+        "live_transcription_enabled": False,
+        "live_transcription": None,
+        "live_ack": None
     }
     
     for key, value in defaults.items():
@@ -347,6 +424,9 @@ def reset_session():
     st.session_state.question_count = 0
     st.session_state.processed_audio_ids = []
     st.session_state.messages = []
+    st.session_state.live_transcription = None
+    st.session_state.live_ack = None
+    audio_memory.accountant.release_session(st.session_state.audio_session_id)
     
     intro_content = (
         f"Hello, I'm your audio reflection assistant. "
@@ -399,6 +479,15 @@ if not st.session_state.session_active:
     
     st.markdown("<br>", unsafe_allow_html=True)
     
+    # Live transcription sends audio in segments while you speak, so long answers
+    # are mostly transcribed by the time you stop
+    st.session_state.live_transcription_enabled = st.toggle(
+        "Transcribe while I speak",
+        value=st.session_state.live_transcription_enabled
+    )
+    
+    st.markdown("<br>", unsafe_allow_html=True)
+    
     # Start Button
     if st.button("🌱 Begin Your Session", use_container_width=True):
         reset_session()
@@ -471,102 +560,127 @@ else:
              
              with col_controls_1:
                  st.markdown("<div style='text-align: center; color: #5a4a3a; font-weight: 600; margin-bottom: 0.5rem;'>Tap to Speak</div>", unsafe_allow_html=True)
-                 audio_input = mic_recorder(
-                     start_prompt="🎙️ Record Answer",
-                     stop_prompt="⏹️ Stop Recording",
-                     key='recorder',
-                     format="webm"
-                 )
+                 if st.session_state.live_transcription_enabled:
+                     # Segments arriving since the last rerun are handled before the
+                     # recorder renders, so the acknowledgement it receives is current
+                     live_text_ready, live_text = collect_live_segments(st.session_state.get('live_recorder'))
+                     streaming_recorder.streaming_recorder(
+                         start_prompt="🎙️ Record Answer",
+                         stop_prompt="⏹️ Stop Recording",
+                         acked=st.session_state.live_ack,
+                         key='live_recorder'
+                     )
+                 else:
+                     audio_input = mic_recorder(
+                         start_prompt="🎙️ Record Answer",
+                         stop_prompt="⏹️ Stop Recording",
+                         key='recorder',
+                         format="webm",
+                         just_once=True
+                     )
              
              with col_controls_2:
                  st.markdown("<div style='text-align: center; color: #5a4a3a; font-weight: 600; margin-bottom: 0.5rem;'>Session Control</div>", unsafe_allow_html=True)
                  if st.button("End Session", use_container_width=True):
                      st.session_state.session_active = False
                      st.session_state.messages = []
+                     audio_memory.accountant.release_session(st.session_state.audio_session_id)
                      st.rerun()
 
 
          # Process Audio Input (Logic stays here as it depends on audio_input existing)
-         if audio_input:
+         user_text = None
+         if st.session_state.live_transcription_enabled:
+             if live_text_ready:
+                 user_text = live_text
+         elif audio_input:
              if audio_input['id'] not in st.session_state.processed_audio_ids:
                  st.session_state.processed_audio_ids.append(audio_input['id'])
                  user_text = transcribe_audio(audio_input['bytes'])
-                 
-                 if user_text:
-                     last_user_msg = next((m for m in reversed(st.session_state.messages) if m["role"] == "user"), None)
+                 # Drop our reference to the raw recording as soon as it is transcribed
+                 audio_input = None
+
+         if user_text:
+             last_user_msg = next((m for m in reversed(st.session_state.messages) if m["role"] == "user"), None)
                      
-                     if not (last_user_msg and last_user_msg['content'] == user_text):
-                         # Processing Animation - UPDATED TO USE CSS PULSE
-                         with anim_placeholder:
-                             st.markdown("""
-                                 <div style='display: flex; flex-direction: column; align-items: center; 
-                                 justify-content: center; padding: 2rem 0; min-height: 280px;'>
-                                     <div class="processing-indicator"></div>
-                                     <div style='font-family: DM Sans, sans-serif; font-size: 1.1rem; 
-                                     color: #8b7355; font-weight: 500; margin-top: 1rem;'>
-                                         Reflecting on your words...
-                                     </div>
-                                 </div>
-                             """, unsafe_allow_html=True)
+             if not (last_user_msg and last_user_msg['content'] == user_text):
+                 # Processing Animation - UPDATED TO USE CSS PULSE
+                 with anim_placeholder:
+                     st.markdown("""
+                         <div style='display: flex; flex-direction: column; align-items: center; 
+                         justify-content: center; padding: 2rem 0; min-height: 280px;'>
+                             <div class="processing-indicator"></div>
+                             <div style='font-family: DM Sans, sans-serif; font-size: 1.1rem; 
+                             color: #8b7355; font-weight: 500; margin-top: 1rem;'>
+                                 Reflecting on your words...
+                             </div>
+                         </div>
+                     """, unsafe_allow_html=True)
                          
-                         time.sleep(2.0) # Increased time to ensure animation is seen
-                         ai_response, is_closing = process_interaction(user_text)
+                 time.sleep(2.0) # Increased time to ensure animation is seen
+                 ai_response, is_closing, stage = process_interaction(user_text)
                          
-                         # Generating response Animation
-                         with anim_placeholder:
-                             st.markdown("""
-                                 <div style='display: flex; flex-direction: column; align-items: center; 
-                                 justify-content: center; padding: 2rem 0; min-height: 280px;'>
-                                     <lottie-player 
-                                         src="https://lottie.host/82df0e8d-d715-46f3-bfca-8d3ec173264c/YI13k65b9W.json" 
-                                         background="transparent" 
-                                         speed="1" 
-                                         style="width: 200px; height: 200px;" 
-                                         loop 
-                                         autoplay>
-                                     </lottie-player>
-                                     <div style='font-family: DM Sans, sans-serif; font-size: 1.1rem; 
-                                     color: #8b7355; font-weight: 500; margin-top: 1rem;'>
-                                         Preparing response...
-                                     </div>
-                                 </div>
-                             """, unsafe_allow_html=True)
+                 # Generating response Animation
+                 with anim_placeholder:
+                     st.markdown("""
+                         <div style='display: flex; flex-direction: column; align-items: center; 
+                         justify-content: center; padding: 2rem 0; min-height: 280px;'>
+                             <lottie-player 
+                                 src="https://lottie.host/82df0e8d-d715-46f3-bfca-8d3ec173264c/YI13k65b9W.json" 
+                                 background="transparent" 
+                                 speed="1" 
+                                 style="width: 200px; height: 200px;" 
+                                 loop 
+                                 autoplay>
+                             </lottie-player>
+                             <div style='font-family: DM Sans, sans-serif; font-size: 1.1rem; 
+                             color: #8b7355; font-weight: 500; margin-top: 1rem;'>
+                                 Preparing response...
+                             </div>
+                         </div>
+                     """, unsafe_allow_html=True)
                          
-                         audio_bytes = generate_ai_response_audio(ai_response, st.session_state.current_voice)
+                 audio_clip = generate_ai_response_audio(
+                     ai_response,
+                     st.session_state.current_voice,
+                     stage=stage
+                 )
                          
-                         if audio_bytes:
-                             with anim_placeholder:
-                                 st.markdown("""
-                                     <div style='display: flex; flex-direction: column; align-items: center; 
-                                     justify-content: center; padding: 2rem 0; min-height: 280px;'>
-                                         <lottie-player 
-                                             src="https://lottie.host/6e082855-0810-444a-8742-c439164d1421/E32D5Z8X9X.json" 
-                                             background="transparent" 
-                                             speed="1" 
-                                             style="width: 200px; height: 200px;" 
-                                             loop 
-                                             autoplay>
-                                         </lottie-player>
-                                         <div style='font-family: DM Sans, sans-serif; font-size: 1.1rem; 
-                                         color: #8b7355; font-weight: 500; margin-top: 1rem;'>
-                                             Speaking...
-                                         </div>
-                                     </div>
-                                 """, unsafe_allow_html=True)
-                                 st.audio(audio_bytes, format="audio/mp3", autoplay=True)
+                 if audio_clip:
+                     with anim_placeholder:
+                         st.markdown("""
+                             <div style='display: flex; flex-direction: column; align-items: center; 
+                             justify-content: center; padding: 2rem 0; min-height: 280px;'>
+                                 <lottie-player 
+                                     src="https://lottie.host/6e082855-0810-444a-8742-c439164d1421/E32D5Z8X9X.json" 
+                                     background="transparent" 
+                                     speed="1" 
+                                     style="width: 200px; height: 200px;" 
+                                     loop 
+                                     autoplay>
+                                 </lottie-player>
+                                 <div style='font-family: DM Sans, sans-serif; font-size: 1.1rem; 
+                                 color: #8b7355; font-weight: 500; margin-top: 1rem;'>
+                                     Speaking...
+                                 </div>
+                             </div>
+                         """, unsafe_allow_html=True)
+                         play_audio_clip(audio_clip)
                          
-                         # Better timing for closing vs regular responses
-                         word_count = len(ai_response.split())
-                         if is_closing:
-                             # Closing statements are longer - give more time
-                             estimated_duration = max(8, word_count / 2.0) + 3
-                             time.sleep(estimated_duration)
-                             st.session_state.session_active = False
-                             st.rerun()
-                         else:
-                             estimated_duration = max(3, word_count / 2.3) + 1
-                             time.sleep(estimated_duration)
-                             st.rerun()
+                 # Better timing for closing vs regular responses
+                 word_count = len(ai_response.split())
+                 if is_closing:
+                     # Closing statements are longer - give more time
+                     estimated_duration = max(8, word_count / 2.0) + 3
+                     time.sleep(estimated_duration)
+                     audio_memory.accountant.release(audio_clip)
+                     st.session_state.session_active = False
+                     st.rerun()
+                 else:
+                     estimated_duration = max(3, word_count / 2.3) + 1
+                     time.sleep(estimated_duration)
+                     audio_memory.accountant.release(audio_clip)
+                     st.rerun()
     
     # ------------------------------------------------------------------------
     # HANDLE PENDING AUDIO (MOVED TO END)
@@ -575,9 +689,10 @@ else:
     # ------------------------------------------------------------------------
     if hasattr(st.session_state, 'pending_audio') and st.session_state.pending_audio:
         # We don't want a spinner here blocking UI, just the anim placeholder above
-        audio_bytes = generate_ai_response_audio(st.session_state.pending_audio, st.session_state.current_voice)
+        # The welcome is question-length, unlike the one-line intro acknowledgement
+        audio_clip = generate_ai_response_audio(st.session_state.pending_audio, st.session_state.current_voice, stage="question")
         
-        if audio_bytes:
+        if audio_clip:
             with anim_placeholder:
                 st.markdown("""
                     <div style='display: flex; flex-direction: column; align-items: center; 
@@ -596,7 +711,7 @@ else:
                         </div>
                     </div>
                 """, unsafe_allow_html=True)
-                st.audio(audio_bytes, format="audio/mp3", autoplay=True)
+                play_audio_clip(audio_clip)
         
         text_to_speak = st.session_state.pending_audio
         word_count = len(text_to_speak.split()) if text_to_speak else 0
@@ -605,6 +720,28 @@ else:
         
         # Block only at the very end, so UI is static and visible
         time.sleep(estimated_duration)
+        audio_memory.accountant.release(audio_clip)
+
+# Audio Memory Metrics (sidebar is collapsed by default)
+with st.sidebar:
+    audio_stats = audio_memory.accountant.metrics(st.session_state.audio_session_id)
+    st.markdown("### Audio Memory")
+    st.metric("This session (in memory)", f"{audio_stats['session_resident_bytes'] / 1024:.0f} KB")
+    st.metric("All sessions (in memory)", f"{audio_stats['resident_bytes'] / 1024:.0f} KB")
+    st.metric("Spilled to disk", f"{audio_stats['spilled_bytes'] / 1024:.0f} KB")
+    st.caption(
+        f"{audio_stats['clips']} clips across {audio_stats['sessions']} sessions · "
+        f"budget {audio_stats['budget_bytes'] / (1024 * 1024):.0f} MB · "
+        "in-memory counts app buffers and st.audio copies until the clip is released"
+    )
+
+    st.markdown("### Model Latency")
+    for route_name, route_stats in sorted(model_routing.router.metrics().items()):
+        status = " · over budget" if route_stats["slow"] else ""
+        st.caption(
+            f"{route_name}: p50 {route_stats['p50']:.1f}s · p95 {route_stats['p95']:.1f}s "
+            f"({route_stats['samples']} calls){status}"
+        )
 
 # Footer
 st.markdown("""
@@ -0,0 +1,272 @@
+import atexit
+import os
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- 1. Budget Configuration ---
+# Global ceiling on audio bytes held in process memory across every session.
+# Clips that would push the total past this are written to disk instead.
+DEFAULT_BUDGET_BYTES = 32 * 1024 * 1024
+
+# Clips still registered after this many seconds belong to sessions that never
+# finished playback (closed tab, crashed rerun) and are swept on the next register.
+STALE_CLIP_SECONDS = 10 * 60
+
+# Spilled clips are streamed from disk by a small HTTP server next to Streamlit,
+# so they never pass through the in-memory media file manager. Streamlit's own
+# static serving cannot be used: it sends audio as text/plain.
+# AUDIO_SPILL_URL is the prefix the browser uses to reach it.
+SPILL_HOST = os.getenv("AUDIO_SPILL_HOST", "0.0.0.0")
+SPILL_PORT = int(os.getenv("AUDIO_SPILL_PORT", 8502))
+SPILL_URL = os.getenv("AUDIO_SPILL_URL", f"http://localhost:{SPILL_PORT}/")
+
+SPILL_PREFIX = "ura-audio-"
+
+
+class AudioClip:
+    """
+    A single audio buffer owned by one session.
+
+    Resident clips hold their bytes until handed to `st.audio`, which keeps its
+    own copy for the rest of the run. Spilled clips live on disk and are played
+    from `url`.
+    """
+
+    def __init__(self, clip_id, session_id, kind, size, data=None, path=None, url=None):
+        self.clip_id = clip_id
+        self.session_id = session_id
+        self.kind = kind
+        self.size = size
+        self.created_at = time.monotonic()
+        self.path = path
+        self.url = url
+        self._data = data
+
+    @property
+    def spilled(self):
+        return self.path is not None
+
+    def take(self):
+        """
+        Return the bytes of a resident clip and drop the clip's own reference.
+
+        The size stays counted as resident until `release`, since Streamlit's
+        media file manager now holds the copy.
+        """
+        data, self._data = self._data, None
+        return data
+
+    def _close(self):
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        self._data = None
+
+
+class _SpillRequestHandler(BaseHTTPRequestHandler):
+    """Serves spilled clips as audio/mpeg; nothing else in the directory is reachable."""
+
+    def do_GET(self):
+        name = self.path.lstrip("/")
+        path = os.path.join(self.server.spill_dir, name)
+        if not name.startswith(SPILL_PREFIX) or "/" in name or not os.path.isfile(path):
+            self.send_error(404)
+            return
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/mpeg")
+                self.send_header("Content-Length", str(size))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                shutil.copyfileobj(f, self.wfile)
+        except OSError:
+            # Released (deleted) between lookup and read, or the client went away
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SpillServer:
+    """Starts the spill HTTP server on first use, in a daemon thread."""
+
+    def __init__(self, host=SPILL_HOST, port=SPILL_PORT, url_prefix=SPILL_URL):
+        self.host = host
+        self.port = port
+        self.url_prefix = url_prefix
+        self._lock = threading.Lock()
+        self._server = None
+
+    def url_for(self, spill_dir, name):
+        with self._lock:
+            if self._server is None:
+                self._server = ThreadingHTTPServer((self.host, self.port), _SpillRequestHandler)
+                self._server.daemon_threads = True
+                self._server.spill_dir = spill_dir
+                threading.Thread(target=self._server.serve_forever, name="audio-spill", daemon=True).start()
+        return self.url_prefix + name
+
+
+class AudioMemoryAccountant:
+    """
+    Tracks every audio buffer the app holds, per session and overall.
+
+    Thread-safe: Streamlit runs each session's script in its own thread, and all
+    of them share the single module-level accountant below.
+    """
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES, spill_dir=None, serve=None):
+        """
+        Args:
+            budget_bytes (int): Global in-memory ceiling.
+            spill_dir (str or None): Where spilled clips go. Defaults to a private
+                temp directory, created on the first spill and removed at exit.
+            serve (callable or None): serve(spill_dir, file_name) -> URL for a
+                spilled clip. Without it, spilled clips have no URL.
+        """
+        self.budget_bytes = budget_bytes
+        self.spill_dir = spill_dir
+        self._serve = serve
+        self._lock = threading.Lock()
+        self._clips = {}
+        self._next_id = 0
+        self._resident_bytes = 0
+        self._spilled_bytes = 0
+
+    def _ensure_spill_dir(self):
+        with self._lock:
+            if self.spill_dir is None:
+                self.spill_dir = tempfile.mkdtemp(prefix=SPILL_PREFIX)
+                atexit.register(shutil.rmtree, self.spill_dir, True)
+            return self.spill_dir
+
+    def register(self, session_id, data, kind="tts", spill=True, suffix=".mp3"):
+        """
+        Take ownership of an audio buffer and return its AudioClip.
+
+        Args:
+            session_id (str): Owning Streamlit session.
+            data (bytes): Encoded audio.
+            kind (str): Label for metrics, e.g. 'tts' or 'upload'.
+            spill (bool): Whether the clip may go to disk when over budget.
+                Pass False for buffers the caller keeps using anyway (uploads),
+                which are then only counted.
+            suffix (str): File extension for a spilled clip.
+        """
+        self.evict_stale()
+        data = bytes(data)
+        size = len(data)
+
+        with self._lock:
+            self._next_id += 1
+            clip_id = self._next_id
+            to_disk = spill and self._resident_bytes + size > self.budget_bytes
+            if not to_disk:
+                self._resident_bytes += size
+
+        if to_disk:
+            spill_dir = self._ensure_spill_dir()
+            # Unguessable name: the spill server serves any clip by name
+            name = f"{SPILL_PREFIX}{secrets.token_urlsafe(16)}{suffix}"
+            path = os.path.join(spill_dir, name)
+            try:
+                url = self._serve(spill_dir, name) if self._serve else None
+            except OSError:
+                # Spill server unavailable (e.g. port taken): keep the clip in memory
+                to_disk = False
+                with self._lock:
+                    self._resident_bytes += size
+
+        if to_disk:
+            with open(path, "wb") as f:
+                f.write(data)
+            del data
+            clip = AudioClip(clip_id, session_id, kind, size, path=path, url=url)
+        else:
+            clip = AudioClip(clip_id, session_id, kind, size, data=data)
+
+        with self._lock:
+            if to_disk:
+                self._spilled_bytes += size
+            self._clips[clip_id] = clip
+        return clip
+
+    def release(self, clip):
+        """Drop a finished clip and free its memory or file."""
+        if clip is None:
+            return
+        with self._lock:
+            if self._clips.pop(clip.clip_id, None) is None:
+                return
+            if clip.spilled:
+                self._spilled_bytes -= clip.size
+            else:
+                self._resident_bytes -= clip.size
+        clip._close()
+
+    def release_session(self, session_id):
+        """Drop every clip owned by a session (session reset or end)."""
+        with self._lock:
+            owned = [c for c in self._clips.values() if c.session_id == session_id]
+        for clip in owned:
+            self.release(clip)
+
+    def evict_stale(self, max_age=STALE_CLIP_SECONDS):
+        """Drop clips that outlived any plausible playback window."""
+        cutoff = time.monotonic() - max_age
+        with self._lock:
+            stale = [c for c in self._clips.values() if c.created_at < cutoff]
+        for clip in stale:
+            self.release(clip)
+
+    def metrics(self, session_id=None):
+        """
+        Snapshot of audio memory usage.
+
+        Resident bytes cover app buffers and the copies handed to `st.audio`
+        for clips not yet released; spilled bytes are on disk.
+
+        Returns:
+            dict: {
+                'resident_bytes': int,      # in memory, all sessions
+                'spilled_bytes': int,       # on disk, all sessions
+                'session_resident_bytes': int,
+                'session_spilled_bytes': int,
+                'clips': int,
+                'sessions': int,
+                'budget_bytes': int
+            }
+        """
+        with self._lock:
+            clips = list(self._clips.values())
+            resident = self._resident_bytes
+            spilled = self._spilled_bytes
+        mine = [c for c in clips if c.session_id == session_id]
+        return {
+            "resident_bytes": resident,
+            "spilled_bytes": spilled,
+            "session_resident_bytes": sum(c.size for c in mine if not c.spilled),
+            "session_spilled_bytes": sum(c.size for c in mine if c.spilled),
+            "clips": len(clips),
+            "sessions": len({c.session_id for c in clips}),
+            "budget_bytes": self.budget_bytes,
+        }
+
+
+# --- 2. Shared Instance ---
+# Modules are imported once per server process, so this outlives script reruns
+# and is shared by every session. Nothing touches the disk or network until the
+# first clip spills.
+spill_server = SpillServer()
+accountant = AudioMemoryAccountant(
+    budget_bytes=int(os.getenv("AUDIO_MEMORY_BUDGET_BYTES", DEFAULT_BUDGET_BYTES)),
+    serve=spill_server.url_for
+)
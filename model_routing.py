@@ -0,0 +1,256 @@
+import json
+import os
+import threading
+import time
+import warnings
+from collections import deque
+
+# --- 1. Routing Policy ---
+# Routes per session stage, in order of preference. The first route whose
+# observed latency is within budget is used. A call that times out or hits a
+# transient error (rate limit, connection, 5xx) is retried once on the next
+# route, or on the same route if it is the last one.
+#
+# `budget_s` is also passed to the client as its timeout. httpx applies it to
+# each phase (connect, write, pool, and read between bytes) rather than as a
+# total deadline, so a call can run somewhat past it; for non-streamed calls
+# the read phase, i.e. waiting for the reply, dominates.
+#
+#   intro    - acknowledge the user's readiness and ask the first question
+#   question - validate the answer and ask the next question
+#   close    - closing summary over the whole session (longest output)
+#
+# The defaults keep the app's original models and never cap a reply below the
+# original 150 tokens, so the spoken question is not cut off. Each second route
+# is the same request with a longer timeout: a retry route for resilience, not
+# a faster model. A genuinely faster (or heavier) route can be configured with
+# a JSON file of the same shape via MODEL_ROUTING_CONFIG; each stage/kind in the
+# file replaces that route list, e.g.
+#
+#   {"close": {"chat": [{"model": "gpt-4o", "max_tokens": 350, "budget_s": 8.0},
+#                       {"model": "gpt-4o-mini", "max_tokens": 300, "budget_s": 20.0}]}}
+DEFAULT_POLICY = {
+    "intro": {
+        "chat": [
+            {"model": "gpt-4o-mini", "max_tokens": 150, "budget_s": 5.0},
+            {"model": "gpt-4o-mini", "max_tokens": 150, "budget_s": 15.0}
+        ],
+        "tts": [
+            {"model": "tts-1", "budget_s": 6.0},
+            {"model": "tts-1", "budget_s": 20.0}
+        ]
+    },
+    "question": {
+        "chat": [
+            {"model": "gpt-4o-mini", "max_tokens": 150, "budget_s": 5.0},
+            {"model": "gpt-4o-mini", "max_tokens": 150, "budget_s": 15.0}
+        ],
+        "tts": [
+            {"model": "tts-1", "budget_s": 6.0},
+            {"model": "tts-1", "budget_s": 20.0}
+        ]
+    },
+    "close": {
+        "chat": [
+            {"model": "gpt-4o-mini", "max_tokens": 300, "budget_s": 8.0},
+            {"model": "gpt-4o-mini", "max_tokens": 300, "budget_s": 20.0}
+        ],
+        "tts": [
+            {"model": "tts-1", "budget_s": 10.0},
+            {"model": "tts-1", "budget_s": 30.0}
+        ]
+    }
+}
+
+REQUIRED_FIELDS = {
+    "chat": ("model", "max_tokens", "budget_s"),
+    "tts": ("model", "budget_s")
+}
+
+# --- 2. Latency Tracking ---
+WINDOW_SIZE = 50          # recent calls kept per route
+MIN_SAMPLES = 5           # a route is never judged slow on fewer samples
+BUDGET_PERCENTILE = 95    # percentile compared against the route budget
+RETRY_AFTER_S = 120       # a slow route gets a single probe call after this long
+
+
+def validate_policy(policy):
+    """Raise ValueError unless every stage and kind has a non-empty, complete route list."""
+    for stage in DEFAULT_POLICY:
+        for kind, fields in REQUIRED_FIELDS.items():
+            routes = policy.get(stage, {}).get(kind)
+            if not isinstance(routes, list) or not routes:
+                raise ValueError(f"{stage}.{kind} needs a non-empty list of routes")
+            for route in routes:
+                missing = [f for f in fields if not isinstance(route, dict) or f not in route]
+                if missing:
+                    raise ValueError(f"{stage}.{kind} route {route!r} is missing {', '.join(missing)}")
+
+
+def load_policy(path=None):
+    """
+    Return the default policy merged with a JSON override file, if any.
+
+    A file that cannot be read or produces an invalid policy is ignored with a
+    warning, so a bad config never takes the app down.
+    """
+    policy = {stage: dict(kinds) for stage, kinds in DEFAULT_POLICY.items()}
+    path = path or os.getenv("MODEL_ROUTING_CONFIG")
+    if not path:
+        return policy
+    try:
+        with open(path) as f:
+            overrides = json.load(f)
+        for stage, kinds in overrides.items():
+            policy.setdefault(stage, {}).update(kinds)
+        validate_policy(policy)
+    except (OSError, ValueError, AttributeError, TypeError) as e:
+        warnings.warn(f"Ignoring model routing config {path}: {e}")
+        return {stage: dict(kinds) for stage, kinds in DEFAULT_POLICY.items()}
+    return policy
+
+
+def stage_for(current_state, should_close=False):
+    """Map the reflection flow state (see reflection_logic) to a routing stage."""
+    if should_close or current_state == "Close":
+        return "close"
+    if current_state == "Intro":
+        return "intro"
+    return "question"
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a non-empty sequence."""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class ModelRouter:
+    """
+    Picks a route per stage and fails over when one runs over its latency budget.
+
+    Thread-safe and shared by all sessions, so latency observed by one session
+    steers the others. `clock` is injectable for testing without real calls.
+    """
+
+    def __init__(self, policy=None, clock=time.monotonic):
+        self.policy = policy if policy is not None else load_policy()
+        validate_policy(self.policy)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._slow_since = {}
+        self._probing = set()
+
+    @staticmethod
+    def route_name(stage, kind, index, route):
+        return f"{stage}/{kind}/{index}-{route['model']}"
+
+    def _route(self, stage, kind, index):
+        route = self.policy[stage][kind][index]
+        return dict(route, name=self.route_name(stage, kind, index, route), stage=stage, kind=kind, index=index)
+
+    def select(self, stage, kind):
+        """
+        Return the preferred in-budget route for a stage.
+
+        Args:
+            stage (str): 'intro', 'question' or 'close'.
+            kind (str): 'chat' or 'tts'.
+
+        Returns:
+            dict: The route, with 'name', 'stage', 'kind' and 'index' keys added
+            for `record` and `fallback`.
+        """
+        routes = self.policy[stage][kind]
+        now = self._clock()
+        with self._lock:
+            for index, route in enumerate(routes[:-1]):
+                name = self.route_name(stage, kind, index, route)
+                slow_since = self._slow_since.get(name)
+                if slow_since is None:
+                    return self._route(stage, kind, index)
+                if name not in self._probing and now - slow_since >= RETRY_AFTER_S:
+                    # One probe call decides whether the route has recovered
+                    self._probing.add(name)
+                    return self._route(stage, kind, index)
+        return self._route(stage, kind, len(routes) - 1)
+
+    def fallback(self, route):
+        """Return the route after `route` in its list, or None if it is the last."""
+        if route["index"] + 1 >= len(self.policy[route["stage"]][route["kind"]]):
+            return None
+        return self._route(route["stage"], route["kind"], route["index"] + 1)
+
+    def record(self, route, seconds):
+        """Record one observed latency for a route returned by `select`."""
+        name = route["name"]
+        now = self._clock()
+        with self._lock:
+            window = self._samples.setdefault(name, deque(maxlen=WINDOW_SIZE))
+            if name in self._probing:
+                self._probing.discard(name)
+                if seconds <= route["budget_s"]:
+                    # Recovered: start a fresh window from the probe
+                    del self._slow_since[name]
+                    window.clear()
+                    window.append(seconds)
+                else:
+                    self._slow_since[name] = now
+                    window.append(seconds)
+                return
+            window.append(seconds)
+            if len(window) >= MIN_SAMPLES and percentile(window, BUDGET_PERCENTILE) > route["budget_s"]:
+                self._slow_since.setdefault(name, now)
+
+    def timed(self, route, fn, *args, **kwargs):
+        """Call fn, record its latency against the route (also on failure), and return its result."""
+        start = self._clock()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.record(route, self._clock() - start)
+
+    def call(self, stage, kind, fn, retry_on=(TimeoutError,)):
+        """
+        Run fn(route) on the selected route and retry once on failure.
+
+        The retry goes to the next route, or to the same route when the selected
+        one is already the last.
+
+        Args:
+            fn (callable): Performs the request for the given route; expected to
+                honour route['budget_s'] as its timeout.
+            retry_on (tuple): Exception types worth one retry (timeouts and
+                other transient errors).
+        """
+        route = self.select(stage, kind)
+        try:
+            return self.timed(route, fn, route)
+        except retry_on:
+            retry_route = self.fallback(route) or route
+            return self.timed(retry_route, fn, retry_route)
+
+    def metrics(self):
+        """
+        Snapshot of observed latency per route.
+
+        Returns:
+            dict: {route_name: {'p50': float, 'p95': float, 'samples': int, 'slow': bool}}
+        """
+        with self._lock:
+            return {
+                name: {
+                    "p50": percentile(window, 50),
+                    "p95": percentile(window, BUDGET_PERCENTILE),
+                    "samples": len(window),
+                    "slow": name in self._slow_since
+                }
+                for name, window in self._samples.items()
+                if window
+            }
+
+
+# --- 3. Shared Instance ---
+router = ModelRouter()
@@ -0,0 +1,51 @@
+import os
+
+import streamlit.components.v1 as components
+
+# A small static component (no build step) that records in segments while the
+# user speaks. Each segment is a complete audio file (webm, or mp4 where the
+# browser cannot record webm), cut at a pause in speech, and is posted to the
+# server as soon as it is finalized. Transcription lives in streaming_transcription.
+_COMPONENT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "streaming_recorder")
+_streaming_recorder = components.declare_component("streaming_recorder", path=_COMPONENT_DIR)
+
+# Segment boundaries (seconds). Cuts happen at the first pause after the
+# minimum length, and unconditionally at the maximum.
+SEGMENT_MIN_SECONDS = 6
+SEGMENT_MAX_SECONDS = 15
+
+# A final segment shorter than this (stop pressed just after a cut) is dropped
+# rather than sent; Whisper rejects clips this short.
+FINAL_SEGMENT_MIN_SECONDS = 0.5
+
+
+def streaming_recorder(start_prompt, stop_prompt, acked=None, key=None):
+    """
+    Render the segmenting recorder.
+
+    Args:
+        start_prompt (str): Label for the record button.
+        stop_prompt (str): Label for the stop button.
+        acked (dict or None): {'recording_id': str, 'seq': int} — segments up to
+            and including `seq` have reached the server and need not be resent.
+        key (str): Widget key. The latest value is also readable from
+            st.session_state[key] before the widget is rendered.
+
+    Returns:
+        dict or None: {
+            'recording_id': str,
+            'mime_type': str,  # e.g. 'audio/webm' or 'audio/mp4'
+            'segments': [{'seq': int, 'audio_base64': str}, ...],  # not yet acked
+            'final_seq': int or None  # last segment to wait for, once stopped
+        }
+    """
+    return _streaming_recorder(
+        start_prompt=start_prompt,
+        stop_prompt=stop_prompt,
+        acked=acked,
+        min_segment_seconds=SEGMENT_MIN_SECONDS,
+        max_segment_seconds=SEGMENT_MAX_SECONDS,
+        min_final_segment_seconds=FINAL_SEGMENT_MIN_SECONDS,
+        key=key,
+        default=None,
+    )
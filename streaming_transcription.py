@@ -0,0 +1,101 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import audio_memory
+
+# Shared across sessions so concurrent recordings cannot spawn unbounded threads.
+# Segments still queued when the user stops are run on the script thread by
+# `finish`, so a final segment never waits behind other sessions' work.
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("TRANSCRIPTION_WORKERS", 4)), thread_name_prefix="transcribe")
+
+
+class StreamingTranscription:
+    """
+    Transcribes the segments of one recording (see streaming_recorder) in the
+    background as they arrive.
+
+    By the time the user stops, every segment but the last is usually already
+    transcribed, so `finish` only waits on one short request.
+    """
+
+    def __init__(self, recording_id, transcribe_fn, session_id, mime_type="audio/webm", executor=None):
+        self.recording_id = recording_id
+        self.session_id = session_id
+        self.mime_type = mime_type
+        self.errors = []
+        self._transcribe_fn = transcribe_fn
+        self._executor = executor or _executor
+        self._segments = {}
+        self._lock = threading.Lock()
+
+    def submit(self, seq, audio_bytes):
+        """Queue a segment for transcription. Segments already seen are ignored."""
+        with self._lock:
+            if seq in self._segments:
+                return
+            clip = audio_memory.accountant.register(self.session_id, audio_bytes, kind="upload", spill=False)
+            # The bytes are kept only until the segment starts running
+            segment = {"clip": clip, "audio_bytes": audio_bytes, "future": None, "result": None}
+            self._segments[seq] = segment
+            segment["future"] = self._executor.submit(self._run, segment)
+
+    def _run(self, segment):
+        with self._lock:
+            audio_bytes, segment["audio_bytes"] = segment["audio_bytes"], None
+        try:
+            return self._transcribe_fn(audio_bytes, self.mime_type)
+        finally:
+            audio_memory.accountant.release(segment["clip"])
+
+    @property
+    def acked_seq(self):
+        """Highest seq such that every segment up to it has been received."""
+        with self._lock:
+            seq = -1
+            while seq + 1 in self._segments:
+                seq += 1
+            return seq
+
+    def _result(self, segment):
+        if segment["result"] is not None:
+            return segment["result"]
+        if segment["future"].cancel():
+            # Still queued behind other sessions: run it here instead
+            if segment["audio_bytes"] is None:
+                return ("error", "an earlier attempt was interrupted")
+            try:
+                segment["result"] = ("ok", self._run(segment))
+            except Exception as e:
+                segment["result"] = ("error", e)
+        else:
+            try:
+                segment["result"] = ("ok", segment["future"].result())
+            except Exception as e:
+                segment["result"] = ("error", e)
+        return segment["result"]
+
+    def finish(self, final_seq):
+        """
+        Wait for segments 0..final_seq and return the joined transcript.
+
+        Safe to call again (e.g. after an interrupted rerun): finished segments
+        are not transcribed twice.
+
+        Returns:
+            str or None: The transcript, or None if no segment produced text.
+        """
+        self.errors = []
+        texts = []
+        for seq in range(final_seq + 1):
+            with self._lock:
+                segment = self._segments.get(seq)
+            if segment is None:
+                self.errors.append(f"Segment {seq} never arrived")
+                continue
+            status, value = self._result(segment)
+            if status == "error":
+                self.errors.append(f"Segment {seq}: {value}")
+            elif value and value.strip():
+                texts.append(value.strip())
+        return " ".join(texts) or None
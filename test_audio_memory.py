@@ -0,0 +1,108 @@
+import os
+import urllib.error
+import urllib.request
+
+import pytest
+
+import audio_memory
+from audio_memory import AudioMemoryAccountant, SpillServer
+
+
+@pytest.fixture
+def accountant(tmp_path):
+    return AudioMemoryAccountant(budget_bytes=10, spill_dir=str(tmp_path))
+
+
+def test_clips_within_budget_stay_resident(accountant):
+    clip = accountant.register("a", b"12345678")
+    assert not clip.spilled
+    assert accountant.metrics("a")["resident_bytes"] == 8
+    assert accountant.metrics("a")["session_resident_bytes"] == 8
+
+
+def test_clip_over_budget_spills_to_disk(accountant, tmp_path):
+    accountant.register("a", b"12345678")
+    clip = accountant.register("a", b"abcdef")
+    assert clip.spilled
+    with open(clip.path, "rb") as f:
+        assert f.read() == b"abcdef"
+    assert os.path.dirname(clip.path) == str(tmp_path)
+    stats = accountant.metrics("a")
+    assert stats["resident_bytes"] == 8
+    assert stats["spilled_bytes"] == 6
+    assert stats["session_spilled_bytes"] == 6
+
+
+def test_uploads_are_counted_but_never_spilled(accountant):
+    accountant.register("a", b"12345678")
+    upload = accountant.register("a", b"abcdef", kind="upload", spill=False)
+    assert not upload.spilled
+    assert accountant.metrics()["resident_bytes"] == 14
+
+
+def test_take_keeps_size_counted_until_release(accountant):
+    clip = accountant.register("a", b"1234")
+    assert clip.take() == b"1234"
+    assert clip.take() is None
+    assert accountant.metrics()["resident_bytes"] == 4
+    accountant.release(clip)
+    assert accountant.metrics()["resident_bytes"] == 0
+
+
+def test_release_removes_spill_file_and_is_idempotent(accountant):
+    accountant.register("a", b"12345678")
+    clip = accountant.register("a", b"abcdef")
+    accountant.release(clip)
+    accountant.release(clip)
+    accountant.release(None)
+    assert not os.path.exists(clip.path)
+    stats = accountant.metrics()
+    assert stats["spilled_bytes"] == 0
+    assert stats["resident_bytes"] == 8
+
+
+def test_release_session_only_drops_that_session(accountant):
+    accountant.register("a", b"1234")
+    accountant.register("b", b"123")
+    accountant.register("a", b"12345678")
+    accountant.release_session("a")
+    stats = accountant.metrics("b")
+    assert stats["clips"] == 1
+    assert stats["sessions"] == 1
+    assert stats["resident_bytes"] == 3
+    assert stats["spilled_bytes"] == 0
+
+
+def test_evict_stale_drops_old_clips(accountant):
+    old = accountant.register("a", b"1234")
+    fresh = accountant.register("b", b"12")
+    old.created_at -= audio_memory.STALE_CLIP_SECONDS + 1
+    accountant.evict_stale()
+    assert accountant.metrics()["clips"] == 1
+    assert accountant.metrics("b")["session_resident_bytes"] == fresh.size
+
+
+def test_no_disk_access_until_first_spill():
+    accountant = AudioMemoryAccountant(budget_bytes=10)
+    accountant.register("a", b"1234")
+    assert accountant.spill_dir is None
+
+
+def test_spill_server_sends_audio_mpeg(tmp_path):
+    server = SpillServer(host="127.0.0.1", port=0, url_prefix="")
+    accountant = AudioMemoryAccountant(budget_bytes=0, spill_dir=str(tmp_path), serve=server.url_for)
+    clip = accountant.register("a", b"ID3-audio")
+    port = server._server.server_address[1]
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/{clip.url}") as response:
+        assert response.headers["Content-Type"] == "audio/mpeg"
+        assert response.read() == b"ID3-audio"
+
+    (tmp_path / "other.txt").write_text("private")
+    with pytest.raises(urllib.error.HTTPError):
+        urllib.request.urlopen(f"http://127.0.0.1:{port}/other.txt")
+
+    accountant.release(clip)
+    with pytest.raises(urllib.error.HTTPError):
+        urllib.request.urlopen(f"http://127.0.0.1:{port}/{clip.url}")
+    server._server.shutdown()
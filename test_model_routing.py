@@ -0,0 +1,165 @@
+import json
+
+import pytest
+
+import model_routing
+from model_routing import ModelRouter
+
+
+class FakeClock:
+    """Stand-in for time.monotonic that tests advance by hand."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+POLICY = {
+    stage: {
+        "chat": [
+            {"model": "primary", "max_tokens": 100, "budget_s": 2.0},
+            {"model": "fallback", "max_tokens": 50, "budget_s": 5.0}
+        ],
+        "tts": [
+            {"model": "tts-primary", "budget_s": 2.0},
+            {"model": "tts-fallback", "budget_s": 5.0}
+        ]
+    }
+    for stage in ("intro", "question", "close")
+}
+
+
+def make_slow(router, stage="close", kind="chat", seconds=9.0):
+    for _ in range(model_routing.MIN_SAMPLES):
+        router.record(router.select(stage, kind), seconds)
+
+
+def test_stage_for_flow_states():
+    assert model_routing.stage_for("Intro") == "intro"
+    assert model_routing.stage_for("Q3") == "question"
+    assert model_routing.stage_for("Q5", should_close=True) == "close"
+
+
+def test_fails_over_when_primary_exceeds_budget():
+    router = ModelRouter(POLICY, clock=FakeClock())
+    assert router.select("close", "chat")["model"] == "primary"
+    make_slow(router)
+    assert router.select("close", "chat")["model"] == "fallback"
+    # Other stages and kinds are tracked separately
+    assert router.select("question", "chat")["model"] == "primary"
+    assert router.select("close", "tts")["model"] == "tts-primary"
+
+
+def test_fast_calls_stay_on_primary():
+    router = ModelRouter(POLICY, clock=FakeClock())
+    for _ in range(20):
+        router.record(router.select("question", "chat"), 0.5)
+    assert router.select("question", "chat")["model"] == "primary"
+
+
+def test_single_slow_probe_keeps_route_failed_over():
+    clock = FakeClock()
+    router = ModelRouter(POLICY, clock=clock)
+    make_slow(router)
+
+    clock.now += model_routing.RETRY_AFTER_S
+    probe = router.select("close", "chat")
+    assert probe["model"] == "primary"
+    # Only one probe at a time
+    assert router.select("close", "chat")["model"] == "fallback"
+
+    router.record(probe, 9.0)
+    assert router.select("close", "chat")["model"] == "fallback"
+
+
+def test_fast_probe_restores_route():
+    clock = FakeClock()
+    router = ModelRouter(POLICY, clock=clock)
+    make_slow(router)
+
+    clock.now += model_routing.RETRY_AFTER_S
+    router.record(router.select("close", "chat"), 1.0)
+    assert router.select("close", "chat")["model"] == "primary"
+    assert router.metrics()["close/chat/0-primary"]["samples"] == 1
+
+
+def test_call_retries_timeout_on_next_route():
+    clock = FakeClock()
+    router = ModelRouter(POLICY, clock=clock)
+    attempts = []
+
+    def fake_request(route):
+        attempts.append(route["model"])
+        clock.now += route["budget_s"]
+        if route["model"] == "primary":
+            raise TimeoutError
+        return "ok"
+
+    assert router.call("intro", "chat", fake_request) == "ok"
+    assert attempts == ["primary", "fallback"]
+    assert router.metrics()["intro/chat/0-primary"]["p95"] == 2.0
+
+
+def test_call_retries_last_route_once_then_raises():
+    router = ModelRouter(POLICY, clock=FakeClock())
+    make_slow(router, stage="intro", kind="tts")
+    attempts = []
+
+    def fake_request(route):
+        attempts.append(route["model"])
+        raise TimeoutError
+
+    with pytest.raises(TimeoutError):
+        router.call("intro", "tts", fake_request)
+    assert attempts == ["tts-fallback", "tts-fallback"]
+
+
+def test_call_recovers_from_transient_error_on_retry():
+    router = ModelRouter(POLICY, clock=FakeClock())
+    attempts = []
+
+    def fake_request(route):
+        attempts.append(route["model"])
+        if len(attempts) == 1:
+            raise ConnectionError
+        return "ok"
+
+    assert router.call("question", "chat", fake_request, retry_on=(ConnectionError,)) == "ok"
+    assert attempts == ["primary", "fallback"]
+
+
+def test_other_errors_are_not_retried():
+    router = ModelRouter(POLICY, clock=FakeClock())
+    attempts = []
+
+    def fake_request(route):
+        attempts.append(route["model"])
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        router.call("question", "chat", fake_request)
+    assert attempts == ["primary"]
+
+
+def test_partial_config_merges_per_kind(tmp_path):
+    path = tmp_path / "routing.json"
+    path.write_text(json.dumps({"close": {"chat": [{"model": "gpt-4o", "max_tokens": 350, "budget_s": 6.0}]}}))
+    policy = model_routing.load_policy(str(path))
+    assert policy["close"]["chat"][0]["model"] == "gpt-4o"
+    assert policy["close"]["tts"] == model_routing.DEFAULT_POLICY["close"]["tts"]
+    ModelRouter(policy).select("close", "tts")
+
+
+@pytest.mark.parametrize("content", [
+    "not json",
+    json.dumps({"close": {"chat": []}}),
+    json.dumps({"question": {"chat": [{"model": "gpt-4o-mini", "budget_s": 3.0}]}}),
+])
+def test_invalid_config_falls_back_to_defaults(tmp_path, content):
+    path = tmp_path / "routing.json"
+    path.write_text(content)
+    with pytest.warns(UserWarning):
+        policy = model_routing.load_policy(str(path))
+    assert policy == model_routing.DEFAULT_POLICY
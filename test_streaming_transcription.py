@@ -0,0 +1,108 @@
+from concurrent.futures import Future
+
+import audio_memory
+from streaming_transcription import StreamingTranscription
+
+
+class QueuedExecutor:
+    """Stand-in executor: work stays queued until `run_all`, like a busy shared pool."""
+
+    def __init__(self):
+        self.queue = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.queue.append((future, fn, args))
+        return future
+
+    def run_all(self):
+        for future, fn, args in self.queue:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    future.set_exception(e)
+        self.queue = []
+
+
+def make(transcribe_fn=None, session_id="s"):
+    calls = []
+
+    def fake_transcribe(audio_bytes, mime_type):
+        calls.append(audio_bytes)
+        if transcribe_fn:
+            return transcribe_fn(audio_bytes)
+        return audio_bytes.decode()
+
+    executor = QueuedExecutor()
+    live = StreamingTranscription("rec-1", fake_transcribe, session_id, executor=executor)
+    return live, executor, calls
+
+
+def test_acked_seq_stops_at_first_gap():
+    live, _, _ = make()
+    assert live.acked_seq == -1
+    live.submit(0, b"a")
+    live.submit(2, b"c")
+    assert live.acked_seq == 0
+    live.submit(1, b"b")
+    assert live.acked_seq == 2
+
+
+def test_duplicate_submit_is_ignored():
+    live, executor, calls = make()
+    live.submit(0, b"hello")
+    live.submit(0, b"hello")
+    executor.run_all()
+    assert live.finish(0) == "hello"
+    assert calls == [b"hello"]
+
+
+def test_finish_runs_queued_segments_inline_and_joins_in_order():
+    live, executor, calls = make()
+    live.submit(0, b"first")
+    executor.run_all()
+    live.submit(1, b"second")
+    # Segment 1 is still queued: finish must not wait for the pool
+    assert live.finish(1) == "first second"
+    assert calls == [b"first", b"second"]
+    executor.run_all()
+    assert calls == [b"first", b"second"]
+
+
+def test_finish_is_repeatable_without_retranscribing():
+    live, executor, calls = make()
+    live.submit(0, b"one")
+    live.submit(1, b"two")
+    assert live.finish(1) == "one two"
+    assert live.finish(1) == "one two"
+    assert len(calls) == 2
+
+
+def test_errors_are_collected_and_other_segments_kept():
+    def transcribe(audio_bytes):
+        if audio_bytes == b"bad":
+            raise ValueError("audio too short")
+        return audio_bytes.decode()
+
+    live, executor, _ = make(transcribe)
+    live.submit(0, b"good")
+    live.submit(1, b"bad")
+    executor.run_all()
+    assert live.finish(2) == "good"
+    assert live.errors == ["Segment 1: audio too short", "Segment 2 never arrived"]
+
+
+def test_finish_returns_none_without_text():
+    live, executor, _ = make(lambda audio_bytes: "  ")
+    live.submit(0, b"silence")
+    assert live.finish(0) is None
+
+
+def test_segment_bytes_released_once_transcribed():
+    live, executor, _ = make(session_id="release-check")
+    live.submit(0, b"12345")
+    assert audio_memory.accountant.metrics("release-check")["session_resident_bytes"] == 5
+    executor.run_all()
+    assert audio_memory.accountant.metrics("release-check")["session_resident_bytes"] == 0
+    assert live._segments[0]["audio_bytes"] is None